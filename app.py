@@ -1,9 +1,38 @@
 import os
+import io
+import gzip
+import csv
+import json
+import sys
+import uuid
+import queue
+import random
+import atexit
+import hashlib
+import logging
+import logging.handlers
 import sqlite3
+import threading
+import time
+import contextvars
+import urllib.request
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import click
 from flask import (
     Flask, render_template, request, redirect,
-    url_for, flash, session
+    url_for, flash, session, g, Response, stream_with_context, jsonify,
+    before_render_template, template_rendered, abort
 )
+from jinja2 import FileSystemBytecodeCache
+
+try:
+    import brotli  # 선택 사항: 설치돼 있으면 br 인코딩도 지원
+except ImportError:
+    brotli = None
 from werkzeug.utils import secure_filename
 from email.mime.text import MIMEText
 import smtplib
@@ -22,33 +51,475 @@ app = Flask(
 )
 app.secret_key = os.environ.get("SECRET_KEY", "supersecretkey")
 
-DB_PATH = os.path.join(BASE_DIR, "shop.db")
+DB_PATH = os.environ.get("DB_PATH", os.path.join(BASE_DIR, "shop.db"))
 UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+# 스키마가 바뀌면 올리고 init_db()에 반영 (PRAGMA user_version 으로 기록)
+SCHEMA_VERSION = 5
 
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
 
 SHOP_NAME = os.environ.get("SHOP_NAME", "DoveShop")
 
+# 멀티 테넌트: Host 별로 다른 상점/DB. 설정 파일이 없으면 위 DB_PATH/SHOP_NAME 하나만 사용
+#   TENANTS_FILE 예) {"a.example.com": {"name": "A샵", "db": "/data/a.db"}, ...}
+TENANTS_FILE = os.environ.get("TENANTS_FILE")
+TENANT_CACHE_SIZE = int(os.environ.get("TENANT_CACHE_SIZE", 32))
+CATALOG_CACHE_SECONDS = float(os.environ.get("CATALOG_CACHE_SECONDS", 10))
+
+# production 이면 템플릿 자동 리로드 끄고 미리 컴파일 (로컬 개발은 APP_ENV=development)
+APP_ENV = os.environ.get("APP_ENV", "production")
+TEMPLATE_CACHE_DIR = os.environ.get("TEMPLATE_CACHE_DIR", os.path.join(BASE_DIR, ".jinja_cache"))
+
+# 응답 압축 (gzip / brotli)
+COMPRESS_RESPONSES = os.environ.get("COMPRESS_RESPONSES", "1") == "1"
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 500))
+COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", 6))
+COMPRESSIBLE_MIMETYPES = {
+    "text/html", "text/css", "text/plain", "text/csv", "text/javascript",
+    "application/javascript", "application/json", "application/x-ndjson",
+}
+
+# 오래된 주문/거래 내역은 별도 SQLite 파일(archive)로 이동
+ARCHIVE_DB_PATH = os.environ.get("ARCHIVE_DB_PATH", os.path.join(BASE_DIR, "shop_archive.db"))
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", 180))
+
+PAGE_SIZE = 50
+
+# 관리자 통계용 읽기 전용 스냅샷 (SQLite online backup 으로 주기적 복사)
+SNAPSHOT_DB_PATH = os.environ.get("SNAPSHOT_DB_PATH", os.path.join(BASE_DIR, "shop_snapshot.db"))
+SNAPSHOT_INTERVAL = int(os.environ.get("SNAPSHOT_INTERVAL", 300))
+REPORT_DAYS = int(os.environ.get("REPORT_DAYS", 30))
+
+# "함께 구매한 상품" 추천 (orders 기반 상품 쌍 집계)
+RECS_BATCH_SIZE = int(os.environ.get("RECS_BATCH_SIZE", 1000))
+RECS_INTERVAL = int(os.environ.get("RECS_INTERVAL", 600))
+RECS_LIMIT = 4
+
+# 상품 일괄 등록
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 500))
+IMAGE_FETCH_WORKERS = int(os.environ.get("IMAGE_FETCH_WORKERS", 4))
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+PRODUCT_FIELDS = ("name", "price", "description", "image", "stock")
+
+# 결제 시작 시 잡아두는 재고 예약 유지 시간(초)
+RESERVATION_TTL = int(os.environ.get("RESERVATION_TTL", 600))
+
+# 백그라운드 작업 (Procfile 의 worker 프로세스)
+JOB_VISIBILITY_TIMEOUT = int(os.environ.get("JOB_VISIBILITY_TIMEOUT", 300))
+JOB_BACKOFF_BASE = int(os.environ.get("JOB_BACKOFF_BASE", 30))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 2))
+# 끝난(done/failed) 작업을 jobs 테이블에 남겨두는 기간(일)
+JOB_RETENTION_DAYS = int(os.environ.get("JOB_RETENTION_DAYS", 7))
+# archive / VACUUM 을 자동 실행할 시간대 "HH:MM-HH:MM" (서버 로컬 시간), 비우면 자동 실행 안 함
+MAINTENANCE_WINDOW = os.environ.get("MAINTENANCE_WINDOW", "03:00-05:00").strip()
+
+# 로그: JSON 한 줄씩, 레벨/이벤트별 샘플링 비율은 환경변수로
+#   LOG_SAMPLE_RATES="http_request=0.1,job_done=0.5"
+# 헬스 체크: 결과 캐시 시간(초), 워커당 동시 처리 가능 요청 수(gunicorn --threads)
+HEALTH_CACHE_SECONDS = float(os.environ.get("HEALTH_CACHE_SECONDS", 2))
+WEB_THREADS = int(os.environ.get("WEB_THREADS", 4))
+HEALTH_PATHS = {"/healthz", "/readyz"}
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATES = {
+    name.strip(): float(rate)
+    for name, rate in (
+        item.split("=", 1)
+        for item in os.environ.get("LOG_SAMPLE_RATES", "http_request=0.1").split(",")
+        if "=" in item
+    )
+}
+
+
+# -----------------------------
+# 로깅 (JSON + 큐 기반 비동기 출력)
+# -----------------------------
+logger = logging.getLogger("doveshop")
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "event": getattr(record, "event", None),
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "pid": record.process,
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """로그를 남기는 스레드에서 request id 를 붙이고, 대량 이벤트는 샘플링"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        rate = LOG_SAMPLE_RATES.get(getattr(record, "event", None))
+        if rate is not None and record.levelno < logging.WARNING:
+            return random.random() < rate
+        return True
+
+
+_log_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+_log_handler.addFilter(ContextFilter())
+_log_listener = None
+
+
+def _start_log_listener():
+    """stdout 출력은 별도 스레드에서 (요청 스레드는 큐에 넣기만 함)"""
+    global _log_listener
+    _log_handler.queue = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _log_listener = logging.handlers.QueueListener(_log_handler.queue, stream)
+    _log_listener.start()
+
+
+def _stop_log_listener():
+    if _log_listener is not None:
+        _log_listener.stop()
+
+
+logger.addHandler(_log_handler)
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+_start_log_listener()
+atexit.register(_stop_log_listener)
+# gunicorn --preload: fork 된 워커에는 리스너 스레드가 없으므로 다시 시작
+os.register_at_fork(after_in_child=_start_log_listener)
+
+
+def log_event(level, event: str, msg: str, **fields):
+    logger.log(level, msg, extra={"event": event, "fields": fields})
+
+
+@app.before_request
+def assign_request_id():
+    g.request_started = time.perf_counter()
+    g.request_id_token = request_id_var.set(
+        request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    )
+
+
+@app.after_request
+def log_request(response):
+    request_id = request_id_var.get()
+    if request_id:
+        response.headers["X-Request-ID"] = request_id
+    if request.path in HEALTH_PATHS:
+        return response
+    started = g.get("request_started")
+    duration_ms = (time.perf_counter() - started) * 1000 if started else None
+    log_event(
+        logging.WARNING if response.status_code >= 500 else logging.INFO,
+        "http_request", f"{request.method} {request.path} {response.status_code}",
+        method=request.method, path=request.path,
+        status=response.status_code, duration_ms=duration_ms
+    )
+    return response
+
+
+@app.teardown_request
+def clear_request_id(exc):
+    token = g.pop("request_id_token", None)
+    if token is not None:
+        request_id_var.reset(token)
+
 
 # -----------------------------
 # 공용 함수
 # -----------------------------
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
+class Tenant:
+    """상점 하나의 설정 + 프로세스 안에서 들고 있는 상태(스키마 확인 여부, 상품 목록 캐시 등)"""
+
+    def __init__(self, key, name, db_path, archive_path=None, snapshot_path=None):
+        base = os.path.splitext(db_path)[0]
+        self.key = key
+        self.name = name
+        self.db_path = db_path
+        self.archive_path = archive_path or f"{base}_archive.db"
+        self.snapshot_path = snapshot_path or f"{base}_snapshot.db"
+        self.lock = threading.Lock()
+        self.schema_ready = False
+        self.catalog = None
+        self.catalog_at = 0.0
+        self.readiness = {"at": 0.0, "body": None, "status": 503}
+        self.readiness_lock = threading.Lock()
+
+
+def load_tenant_config():
+    if not TENANTS_FILE:
+        return {}
+    with open(TENANTS_FILE, encoding="utf-8") as f:
+        return {host.lower(): conf for host, conf in json.load(f).items()}
+
+
+TENANT_CONFIG = load_tenant_config()
+DEFAULT_TENANT = Tenant("default", SHOP_NAME, DB_PATH, ARCHIVE_DB_PATH, SNAPSHOT_DB_PATH)
+
+_tenants = OrderedDict()
+_tenants_lock = threading.Lock()
+tenant_var = contextvars.ContextVar("tenant", default=None)
+
+
+def get_tenant(key: str) -> Tenant:
+    """
+    처음 요청이 온 테넌트만 만들고, 최근 사용한 TENANT_CACHE_SIZE 개까지만 유지 (LRU)
+    밀려난 테넌트는 다음 요청 때 다시 만들어짐 (DB 파일은 그대로)
+    """
+    with _tenants_lock:
+        tenant = _tenants.get(key)
+        if tenant is not None:
+            _tenants.move_to_end(key)
+            return tenant
+
+        conf = TENANT_CONFIG[key]
+        tenant = Tenant(
+            key, conf.get("name", key), conf["db"],
+            conf.get("archive_db"), conf.get("snapshot_db")
+        )
+        _tenants[key] = tenant
+        while len(_tenants) > TENANT_CACHE_SIZE:
+            _tenants.popitem(last=False)
+        return tenant
+
+
+def all_tenants():
+    if not TENANT_CONFIG:
+        return [DEFAULT_TENANT]
+    return [get_tenant(key) for key in TENANT_CONFIG]
+
+
+def current_tenant() -> Tenant:
+    """
+    요청 중이면 Host 로 정한 테넌트, CLI/worker 는 TENANT 환경변수
+    TENANTS_FILE 을 쓰지 않으면 항상 기본 상점
+    """
+    tenant = tenant_var.get()
+    if tenant is not None:
+        return tenant
+    if not TENANT_CONFIG:
+        return DEFAULT_TENANT
+    # 멀티 테넌트에서는 기본 상점으로 조용히 떨어지지 않도록 TENANT 를 꼭 지정해야 함
+    key = os.environ.get("TENANT", "").lower()
+    if key not in TENANT_CONFIG:
+        raise click.UsageError(
+            f"TENANTS_FILE 사용 중에는 TENANT 환경변수로 상점을 지정해야 합니다 "
+            f"(가능한 값: {', '.join(sorted(TENANT_CONFIG))})"
+        )
+    return get_tenant(key)
+
+
+@contextmanager
+def use_tenant(tenant: Tenant):
+    token = tenant_var.set(tenant)
+    try:
+        yield tenant
+    finally:
+        tenant_var.reset(token)
+
+
+def stream_for_tenant(generator):
+    """
+    스트리밍 응답은 teardown(clear_tenant) 이후에도 돌 수 있으므로
+    뷰에서 정한 테넌트를 잡아 두고 그 안에서 제너레이터를 돌림
+    """
+    tenant = current_tenant()
+
+    def run():
+        with use_tenant(tenant):
+            yield from generator
+
+    return stream_with_context(run())
+
+
+def shop_name() -> str:
+    return current_tenant().name
+
+
+@app.before_request
+def resolve_tenant():
+    if not TENANT_CONFIG:
+        return
+    host = request.host.split(":", 1)[0].lower()
+    if host in TENANT_CONFIG:
+        tenant = get_tenant(host)
+    elif request.path in HEALTH_PATHS:
+        return  # 파드 IP 로 오는 프로브: 상점은 readyz 에서 정함
+    else:
+        abort(404)
+    g.tenant_token = tenant_var.set(tenant)
+
+    # 모든 테넌트가 같은 SECRET_KEY 로 서명하므로, 다른 상점에서 로그인한 세션은 버림
+    if "user_id" in session and session.get("tenant") != tenant.key:
+        session.clear()
+
+
+@app.teardown_request
+def clear_tenant(exc):
+    token = g.pop("tenant_token", None)
+    if token is not None:
+        tenant_var.reset(token)
+
+
+@app.context_processor
+def inject_shop_name():
+    return {"shop_name": shop_name()}
+
+
+def _connect():
+    conn = sqlite3.connect(current_tenant().db_path)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+def get_db():
+    conn = _connect()
+    if not current_tenant().schema_ready:
+        ensure_schema(conn)
+    return conn
+
+
+def ensure_schema(conn):
+    """
+    프로세스당(테넌트당) 처음 DB를 쓸 때 한 번만 스키마 버전 확인
+    (release 단계에서 flask migrate 를 이미 돌렸다면 PRAGMA 한 번으로 끝)
+    """
+    tenant = current_tenant()
+    with tenant.lock:
+        if tenant.schema_ready:
+            return
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            init_db(conn)
+        tenant.schema_ready = True
+
+
+def get_catalog(conn):
+    """상품 목록을 테넌트별로 CATALOG_CACHE_SECONDS 동안 캐시 (상품 등록/삭제/재고 변경 시 무효화)"""
+    tenant = current_tenant()
+    now = time.monotonic()
+    if tenant.catalog is None or now - tenant.catalog_at >= CATALOG_CACHE_SECONDS:
+        tenant.catalog = conn.execute("SELECT * FROM products ORDER BY id DESC").fetchall()
+        tenant.catalog_at = now
+    return tenant.catalog
+
+
+def invalidate_catalog():
+    current_tenant().catalog = None
+
+
+def attach_archive(conn):
+    """
+    archive DB를 현재 커넥션에 'archive' 스키마로 붙임
+    (과거 내역이 필요한 경우에만 호출)
+    """
+    attached = {row["name"] for row in conn.execute("PRAGMA database_list")}
+    if "archive" in attached:
+        return conn
+
+    conn.execute("ATTACH DATABASE ? AS archive", (current_tenant().archive_path,))
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS archive.orders (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        product_id INTEGER,
+        phone TEXT,
+        receipt TEXT,
+        status TEXT,
+        created_at TEXT
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS archive.transactions (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        type TEXT,
+        amount INTEGER,
+        description TEXT,
+        status TEXT,
+        created_at TEXT,
+        request_id INTEGER
+    )
+    """)
+    archive_columns = {row[1] for row in conn.execute("PRAGMA archive.table_info(transactions)")}
+    if "request_id" not in archive_columns:
+        conn.execute("ALTER TABLE archive.transactions ADD COLUMN request_id INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_orders_user ON orders (user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_transactions_user ON transactions (user_id)")
+    return conn
+
+
+def has_archive():
+    return os.path.exists(current_tenant().archive_path)
+
+
+def fetch_history_page(conn, sql, params, table, page):
+    """
+    최신 내역(main)부터 페이지 단위로 조회하고,
+    main 내역이 끝나는 페이지부터만 archive 내역을 이어서 조회
+    sql의 {table} 자리에 main.<table> / archive.<table> 이 들어감
+    """
+    offset = (page - 1) * PAGE_SIZE
+    hot_sql = sql.format(table=f"main.{table}")
+    rows = conn.execute(
+        hot_sql + " LIMIT ? OFFSET ?",
+        (*params, PAGE_SIZE + 1, offset)
+    ).fetchall()
+
+    if len(rows) <= PAGE_SIZE and has_archive():
+        if rows:
+            hot_total = offset + len(rows)
+        else:
+            hot_total = conn.execute(
+                f"SELECT COUNT(*) AS cnt FROM ({hot_sql})", params
+            ).fetchone()["cnt"]
+
+        attach_archive(conn)
+        rows += conn.execute(
+            sql.format(table=f"archive.{table}") + " LIMIT ? OFFSET ?",
+            (*params, PAGE_SIZE + 1 - len(rows), max(0, offset - hot_total))
+        ).fetchall()
+
+    has_next = len(rows) > PAGE_SIZE
+    return rows[:PAGE_SIZE], has_next
+
+
+def count_with_archive(conn, table, where="1=1", params=()):
+    """main + archive 테이블의 COUNT(*) 합산"""
+    sql = "SELECT COUNT(*) AS cnt FROM {table} WHERE " + where
+    total = conn.execute(sql.format(table=f"main.{table}"), params).fetchone()["cnt"]
+    if has_archive():
+        attach_archive(conn)
+        total += conn.execute(sql.format(table=f"archive.{table}"), params).fetchone()["cnt"]
+    return total
+
+
+def upload_path(filename: str) -> str:
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    return os.path.join(UPLOAD_FOLDER, filename)
+
+
 def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
 def send_email(to_email: str, subject: str, body: str):
-    print("📧 [테스트 모드] 메일 전송 생략")
-    print("To:", to_email)
-    print("Subject:", subject)
-    print("Body:", body)
+    """실제 전송은 worker 프로세스에서 (요청 처리 시간에 SMTP 대기 없음)"""
+    enqueue_job("send_email", {"to_email": to_email, "subject": subject, "body": body})
+
+
+def deliver_email(to_email: str, subject: str, body: str):
+    log_event(
+        logging.INFO, "email_skipped", "테스트 모드 - 메일 전송 생략",
+        to=to_email, subject=subject, body_length=len(body)
+    )
     return
 
     """
@@ -60,10 +531,10 @@ def send_email(to_email: str, subject: str, body: str):
     smtp_password = os.environ.get("SMTP_PASSWORD")
 
     if not smtp_email or not smtp_password:
-        print("❌ SMTP 설정 없음 - 메일 전송 스킵")
-        print("받는 사람:", to_email)
-        print("제목:", subject)
-        print("내용:\n", body)
+        log_event(
+            logging.WARNING, "email_skipped", "SMTP 설정 없음 - 메일 전송 스킵",
+            to=to_email, subject=subject, body_length=len(body)
+        )
         return
 
     msg = MIMEText(body)
@@ -76,15 +547,41 @@ def send_email(to_email: str, subject: str, body: str):
         s.login(smtp_email, smtp_password)
         s.send_message(msg)
         s.quit()
-        print("📩 메일 전송 성공 ->", to_email)
+        log_event(logging.INFO, "email_sent", "메일 전송 성공", to=to_email, subject=subject)
     except Exception as e:
-        print("❌ 메일 전송 실패:", e)
+        log_event(logging.ERROR, "email_failed", "메일 전송 실패", to=to_email, error=repr(e))
+        raise  # 작업 재시도
 
 
 def login_required():
     return "user_id" in session
 
 
+def get_membership(conn, uid):
+    """
+    로그인 사용자의 찜/장바구니 상품 id 집합을 한 번의 쿼리로 로드
+    (요청 단위로 g에 캐시해서 상품 카드마다 조회하지 않도록)
+    """
+    cached = g.get("membership")
+    if cached is not None:
+        return cached
+
+    wishlist_ids, cart_ids = set(), set()
+    rows = conn.execute("""
+        SELECT 'wishlist' AS kind, product_id FROM wishlist WHERE user_id=?
+        UNION ALL
+        SELECT 'cart' AS kind, product_id FROM cart WHERE user_id=?
+    """, (uid, uid)).fetchall()
+    for row in rows:
+        if row["kind"] == "wishlist":
+            wishlist_ids.add(row["product_id"])
+        else:
+            cart_ids.add(row["product_id"])
+
+    g.membership = (wishlist_ids, cart_ids)
+    return g.membership
+
+
 def admin_required():
     return session.get("is_admin") == 1
 
@@ -92,8 +589,10 @@ def admin_required():
 # -----------------------------
 # DB 초기화
 # -----------------------------
-def init_db():
-    conn = get_db()
+def init_db(conn=None):
+    own_conn = conn is None
+    if own_conn:
+        conn = _connect()
     cur = conn.cursor()
 
     # 사용자
@@ -114,7 +613,64 @@ def init_db():
         name TEXT,
         price INTEGER,
         description TEXT,
-        image TEXT
+        image TEXT,
+        stock INTEGER
+    )
+    """)
+    # v2: 재고 컬럼 (NULL = 무제한)
+    product_columns = {row[1] for row in cur.execute("PRAGMA table_info(products)")}
+    if "stock" not in product_columns:
+        cur.execute("ALTER TABLE products ADD COLUMN stock INTEGER")
+
+    # 재고 예약 (held -> committed / expired / released)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS reservations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        product_id INTEGER,
+        qty INTEGER DEFAULT 1,
+        status TEXT DEFAULT 'held',
+        expires_at TEXT,
+        created_at TEXT DEFAULT (datetime('now','localtime'))
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_reservations_status ON reservations (status, expires_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_reservations_user ON reservations (user_id, product_id, status)")
+
+    # v3: 백그라운드 작업 큐 (queued -> running -> done / failed)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        payload TEXT,
+        status TEXT DEFAULT 'queued',
+        attempts INTEGER DEFAULT 0,
+        max_attempts INTEGER DEFAULT 5,
+        run_at TEXT,
+        locked_until TEXT,
+        last_error TEXT,
+        created_at TEXT DEFAULT (datetime('now','localtime')),
+        started_at TEXT,
+        finished_at TEXT
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, run_at)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_jobs_kind ON jobs (kind, created_at)")
+
+    # v4: 함께 구매한 상품 쌍 (양방향으로 저장) + 배치 진행 위치 등 내부 상태
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS product_pairs (
+        product_id INTEGER,
+        other_id INTEGER,
+        score INTEGER DEFAULT 0,
+        PRIMARY KEY (product_id, other_id)
+    ) WITHOUT ROWID
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_product_pairs_score ON product_pairs (product_id, score DESC)")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS app_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
     )
     """)
 
@@ -180,9 +736,44 @@ def init_db():
         amount INTEGER,
         description TEXT,
         status TEXT,
-        created_at TEXT DEFAULT (datetime('now','localtime'))
+        created_at TEXT DEFAULT (datetime('now','localtime')),
+        request_id INTEGER
     )
     """)
+    # v5: 충전/환불 요청 내역이 어느 요청(recharge_requests / refund_requests)의 것인지
+    # 기존 행은 같은 사용자/금액/시각의 요청으로 한 번 채워 넣음
+    transaction_columns = {row[1] for row in cur.execute("PRAGMA table_info(transactions)")}
+    if "request_id" not in transaction_columns:
+        cur.execute("ALTER TABLE transactions ADD COLUMN request_id INTEGER")
+        for kind, table in (("recharge_request", "recharge_requests"), ("refund_request", "refund_requests")):
+            cur.execute(f"""
+            UPDATE transactions SET request_id = (
+                SELECT r.id FROM {table} r
+                WHERE r.user_id = transactions.user_id
+                  AND r.amount = transactions.amount
+                  AND r.created_at = transactions.created_at
+                ORDER BY r.id LIMIT 1
+            )
+            WHERE type = ? AND request_id IS NULL
+            """, (kind,))
+
+    # 긴 조회(내보내기 등) 중에도 쓰기가 막히지 않도록 WAL 모드 사용
+    cur.execute("PRAGMA journal_mode=WAL")
+
+    # 찜 목록 중복 정리 후 (user_id, product_id) 유니크 보장
+    cur.execute("""
+    DELETE FROM wishlist
+    WHERE id NOT IN (
+        SELECT MIN(id) FROM wishlist GROUP BY user_id, product_id
+    )
+    """)
+    cur.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_wishlist_user_product
+    ON wishlist (user_id, product_id)
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_cart_user ON cart (user_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_user ON orders (user_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user ON transactions (user_id)")
 
     # 기본 관리자 계정
     admin_exists = cur.execute("SELECT * FROM users WHERE is_admin=1").fetchone()
@@ -191,14 +782,903 @@ def init_db():
             "INSERT INTO users (username, password, is_admin, balance) VALUES (?, ?, 1, 0)",
             ("admin", "1234"),
         )
-        print("✅ 기본 관리자 계정 생성됨: admin / 1234")
+        log_event(logging.INFO, "admin_created", "기본 관리자 계정 생성됨", username="admin")
+
+    cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+    if own_conn:
+        conn.close()
+
+
+@app.cli.command("init-db")
+def init_db_command():
+    for tenant in all_tenants():
+        with use_tenant(tenant):
+            init_db()
+    click.echo(f"DB 초기화 완료 (schema v{SCHEMA_VERSION})")
+
+
+@app.cli.command("migrate")
+def migrate_command():
+    for tenant in all_tenants():
+        with use_tenant(tenant):
+            conn = _connect()
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                init_db(conn)
+                click.echo(f"[{tenant.key}] 마이그레이션 완료: v{version} -> v{SCHEMA_VERSION}")
+            else:
+                click.echo(f"[{tenant.key}] 이미 최신 스키마입니다 (v{version})")
+            conn.close()
+
+
+# -----------------------------
+# 템플릿: 바이트코드 캐시 / 미리 컴파일 / 렌더 시간
+# -----------------------------
+TEMPLATE_STATS = {}
+_template_stats_lock = threading.Lock()
+
+
+def template_names():
+    return sorted(f for f in os.listdir(BASE_DIR) if f.endswith(".html"))
+
+
+def configure_templates():
+    """
+    {% %} 태그 줄의 앞뒤 공백/개행 제거
+    production: 파일 stat 검사(auto_reload) 끄고, 컴파일 결과를 디스크에 캐시
+    """
+    env = app.jinja_env
+    env.trim_blocks = True
+    env.lstrip_blocks = True
+    if APP_ENV == "production":
+        app.config["TEMPLATES_AUTO_RELOAD"] = False
+        env.auto_reload = False
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+        # 공백 처리 옵션이 바뀌면 캐시 파일 이름도 달라지도록
+        env.bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_DIR, "__jinja2_trim_%s.cache")
+
+
+def precompile_templates():
+    """모든 템플릿을 미리 로드. (이름, 걸린 시간) 목록 반환"""
+    timings = []
+    for name in template_names():
+        started = time.perf_counter()
+        app.jinja_env.get_template(name)
+        timings.append((name, time.perf_counter() - started))
+    return timings
+
+
+@before_render_template.connect_via(app)
+def _template_render_started(sender, template, context, **extra):
+    g.setdefault("template_started", {})[template.name] = time.perf_counter()
+
+
+@template_rendered.connect_via(app)
+def _template_render_finished(sender, template, context, **extra):
+    started = g.get("template_started", {}).pop(template.name, None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    with _template_stats_lock:
+        stat = TEMPLATE_STATS.setdefault(template.name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stat["count"] += 1
+        stat["total_ms"] += elapsed * 1000
+        stat["max_ms"] = max(stat["max_ms"], elapsed * 1000)
+
+
+@app.route("/admin/template-stats")
+def admin_template_stats():
+    if not admin_required():
+        return redirect(url_for("admin_login"))
+    with _template_stats_lock:
+        stats = {
+            name: dict(stat, avg_ms=stat["total_ms"] / stat["count"])
+            for name, stat in TEMPLATE_STATS.items()
+        }
+    return jsonify(pid=os.getpid(), templates=stats)
+
+
+# -----------------------------
+# 응답 압축
+# -----------------------------
+def choose_encoding():
+    if brotli is not None and request.accept_encodings["br"]:
+        return "br"
+    if request.accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress_body(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=min(COMPRESS_LEVEL, 11))
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL)
+
+
+@app.after_request
+def compress_response(response):
+    # 정적 파일(uploads/ 이미지 등)과 스트리밍 응답은 건드리지 않음
+    if (
+        not COMPRESS_RESPONSES
+        or response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.set_data(compress_body(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+# 빌드 단계에서 실행하면 바이트코드 캐시가 채워져 배포 직후 첫 요청도 빠름
+@app.cli.command("compile-templates")
+def compile_templates_command():
+    configure_templates()
+    for name, elapsed in precompile_templates():
+        click.echo(f"{name:32s} {elapsed * 1000:7.1f} ms")
+
+
+def create_app():
+    """
+    gunicorn --preload 용 앱 팩토리
+    import 시점에는 DB/업로드 폴더를 건드리지 않고,
+    스키마 확인은 첫 get_db(), 폴더 생성은 첫 업로드에서 지연 처리
+    production 에서는 템플릿을 마스터 프로세스에서 미리 컴파일해 워커들이 공유
+    """
+    configure_templates()
+    if APP_ENV == "production":
+        precompile_templates()
+    return app
+
+
+# -----------------------------
+# 과거 내역 아카이브 / DB 유지보수
+# -----------------------------
+# 아카이브 대상 조건 (created_at < 기준 시각 과 함께 사용)
+#   주문: 단건 주문은 'pending' 에서 상태가 바뀌지 않으므로(관리자가 메일로 처리) 기간만으로 판단
+#   거래: 충전/환불 요청 내역은 연결된 요청이 처리(pending 이 아닌 상태)된 뒤에만,
+#         나머지(구매/충전 승인/환불 결과)는 기록 시점에 이미 끝난 내역이라 기간만으로 판단
+#         request_id 를 채우지 못한 예전 요청 내역도 기간만으로 판단
+ARCHIVE_WHERE = {
+    "orders": "1=1",
+    "transactions": """(
+        type NOT IN ('recharge_request', 'refund_request')
+        OR request_id IS NULL
+        OR (type = 'recharge_request' AND request_id IN (
+            SELECT id FROM main.recharge_requests WHERE status != 'pending'))
+        OR (type = 'refund_request' AND request_id IN (
+            SELECT id FROM main.refund_requests WHERE status != 'pending'))
+    )""",
+}
+
+
+def archive_old_records(days: int = ARCHIVE_AFTER_DAYS):
+    """
+    끝난 주문/거래 내역(ARCHIVE_WHERE) 중 days 일보다 오래된 것을
+    archive DB로 이동. 이동한 (주문 수, 거래 수) 반환
+    """
+    conn = attach_archive(get_db())
+    # 기준 시각을 한 번만 구해 INSERT/DELETE 가 정확히 같은 행을 보도록 함
+    cutoff = ((datetime.now() - timedelta(days=int(days))).strftime("%Y-%m-%d %H:%M:%S"),)
+    moved = []
+    try:
+        # WAL 모드에서는 DB 파일 두 개에 걸친 commit 이 원자적이지 않으므로 두 단계로 나눔
+        # 1) archive 에 복사 후 commit  2) archive 에 들어간 행만 main 에서 삭제
+        # 중간에 죽어도 양쪽에 중복이 남을 뿐이고, 다시 실행하면 정리됨
+        for table in ("orders", "transactions"):
+            conn.execute(f"""
+                INSERT OR IGNORE INTO archive.{table}
+                SELECT * FROM main.{table} WHERE created_at < ? AND {ARCHIVE_WHERE[table]}
+            """, cutoff)
+        conn.commit()
+
+        for table in ("orders", "transactions"):
+            cur = conn.execute(f"""
+                DELETE FROM main.{table}
+                WHERE created_at < ?
+                  AND EXISTS (SELECT 1 FROM archive.{table} a WHERE a.id = main.{table}.id)
+            """, cutoff)
+            moved.append(cur.rowcount)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return tuple(moved)
+
+
+def db_maintenance():
+    """
+    통계 갱신(ANALYZE) + 빈 공간 정리(VACUUM)
+    VACUUM 은 DB 전체를 독점 잠금하므로 worker 는 MAINTENANCE_WINDOW 시간대에만 실행
+    """
+    conn = get_db()
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+    conn.execute("VACUUM")
+    conn.close()
+
+    if has_archive():
+        conn = sqlite3.connect(current_tenant().archive_path)
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+        conn.close()
+
+
+# worker 가 하루 한 번 MAINTENANCE_WINDOW 시간대에 자동 실행 (WINDOWED_JOBS). 수동 실행:
+#   flask --app app archive && flask --app app maintenance
+@app.cli.command("archive")
+@click.option("--days", default=ARCHIVE_AFTER_DAYS, show_default=True,
+              help="이 일수보다 오래된 처리 완료 내역을 이동")
+def archive_command(days):
+    orders_moved, tx_moved = archive_old_records(days)
+    click.echo(f"아카이브 완료: 주문 {orders_moved}건, 거래 {tx_moved}건")
+
+
+@app.cli.command("maintenance")
+def maintenance_command():
+    db_maintenance()
+    click.echo("ANALYZE / VACUUM 완료")
+
+
+# -----------------------------
+# 재고 / 예약
+# -----------------------------
+class OutOfStock(Exception):
+    pass
+
+
+def _now_str(offset_seconds: int = 0) -> str:
+    return (datetime.now() + timedelta(seconds=offset_seconds)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def reserve_stock(conn, uid, pid, qty=1):
+    """
+    조건부 UPDATE(stock >= qty)로 재고를 먼저 차감하고 예약을 남김
+    동시에 여러 요청이 와도 UPDATE 한 번에 판정되므로 초과 판매가 없음
+    재고 무제한(NULL) 상품이면 None, 재고 부족이면 OutOfStock
+    commit 은 호출하는 쪽에서
+    """
+    cur = conn.execute(
+        "UPDATE products SET stock = stock - ? WHERE id=? AND stock >= ?",
+        (qty, pid, qty)
+    )
+    if cur.rowcount == 0:
+        row = conn.execute("SELECT stock FROM products WHERE id=?", (pid,)).fetchone()
+        if row is not None and row["stock"] is None:
+            return None
+        raise OutOfStock(pid)
+
+    invalidate_catalog()
+    cur = conn.execute("""
+        INSERT INTO reservations (user_id, product_id, qty, status, expires_at)
+        VALUES (?, ?, ?, 'held', ?)
+    """, (uid, pid, qty, _now_str(RESERVATION_TTL)))
+    return cur.lastrowid
+
+
+def find_reservation(conn, uid, pid):
+    row = conn.execute("""
+        SELECT id FROM reservations
+        WHERE user_id=? AND product_id=? AND status='held' AND expires_at > ?
+        ORDER BY id DESC LIMIT 1
+    """, (uid, pid, _now_str())).fetchone()
+    return row["id"] if row else None
+
+
+def commit_reservation(conn, reservation_id) -> bool:
+    """만료 처리되기 전에 확정했으면 True"""
+    cur = conn.execute(
+        "UPDATE reservations SET status='committed' WHERE id=? AND status='held'",
+        (reservation_id,)
+    )
+    return cur.rowcount == 1
+
+
+def expire_reservations(conn=None) -> int:
+    """만료된 예약의 재고를 되돌리고 expired 로 표시. 되돌린 예약 수 반환"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db()
+    now = _now_str()
+    try:
+        conn.execute("""
+            UPDATE products
+            SET stock = stock + (
+                SELECT SUM(r.qty) FROM reservations r
+                WHERE r.product_id = products.id
+                  AND r.status='held' AND r.expires_at <= ?
+            )
+            WHERE id IN (
+                SELECT product_id FROM reservations
+                WHERE status='held' AND expires_at <= ?
+            )
+        """, (now, now))
+        cur = conn.execute(
+            "UPDATE reservations SET status='expired' WHERE status='held' AND expires_at <= ?",
+            (now,)
+        )
+        conn.commit()
+        if cur.rowcount:
+            invalidate_catalog()
+        return cur.rowcount
+    finally:
+        if own_conn:
+            conn.close()
+
+
+@app.cli.command("expire-reservations")
+def expire_reservations_command():
+    click.echo(f"만료된 예약 {expire_reservations()}건 정리")
+
+
+# -----------------------------
+# 관리자 통계용 스냅샷
+# -----------------------------
+def refresh_snapshot():
+    """
+    운영 DB를 online backup API로 임시 파일에 복사한 뒤 교체
+    (복사 중에도 운영 DB 쓰기는 계속 가능, 읽는 쪽은 항상 완성된 파일만 봄)
+    """
+    snapshot_path = current_tenant().snapshot_path
+    tmp_path = snapshot_path + ".tmp"
+    src = get_db()
+    dst = sqlite3.connect(tmp_path)
+    try:
+        src.backup(dst, pages=1024)
+        # 읽기 전용으로 열 수 있도록 WAL 해제
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+        src.close()
+    os.replace(tmp_path, snapshot_path)
+
+
+def get_snapshot_db():
+    """스냅샷이 있으면 읽기 전용으로, 없으면 운영 DB를 query_only 로 연결"""
+    snapshot_path = current_tenant().snapshot_path
+    if os.path.exists(snapshot_path):
+        conn = sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+    else:
+        conn = get_db()
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+@app.cli.command("refresh-snapshot")
+def refresh_snapshot_command():
+    refresh_snapshot()
+    click.echo(f"스냅샷 갱신 완료: {current_tenant().snapshot_path}")
+
+
+# -----------------------------
+# 함께 구매한 상품 추천
+# -----------------------------
+def get_state(conn, key, default=None):
+    row = conn.execute("SELECT value FROM app_state WHERE key=?", (key,)).fetchone()
+    return row["value"] if row else default
+
+
+def set_state(conn, key, value):
+    conn.execute("""
+        INSERT INTO app_state (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value=excluded.value
+    """, (key, str(value)))
+
+
+def update_recommendations(batch_size: int = RECS_BATCH_SIZE) -> int:
+    """
+    마지막으로 처리한 주문 이후의 주문만 batch_size 씩 읽어서 상품 쌍 점수를 더함
+    (같은 사용자가 이전에 산 다른 상품들과 짝을 지음, 같은 상품 재구매는 제외)
+    배치마다 commit 하므로 메모리는 배치 크기만큼만 사용. 처리한 주문 수 반환
+    archive 로 옮겨진 주문도 함께 읽으므로 --full 재계산에서도 빠지지 않음
+    점수 계산은 잠금 없이 하고, 반영할 때만 짧게 쓰기 잠금을 잡음
+    """
+    conn = get_db()
+    orders = "main.orders"
+    if has_archive():
+        attach_archive(conn)
+        orders = """(
+            SELECT id, user_id, product_id FROM main.orders
+            UNION ALL
+            SELECT id, user_id, product_id FROM archive.orders
+        )"""
+    processed = 0
+    try:
+        while True:
+            last_id = int(get_state(conn, "recs_last_order_id", 0))
+            rows = conn.execute(f"""
+                SELECT id, user_id, product_id FROM {orders}
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            """, (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+
+            pairs = {}
+            prev_id = None
+            for row in rows:
+                # 아카이브 도중 멈추면 같은 주문이 main/archive 양쪽에 남을 수 있음 (id 순이라 연달아 나옴)
+                if row["id"] == prev_id:
+                    continue
+                prev_id = row["id"]
+                history = conn.execute(f"""
+                    SELECT DISTINCT product_id FROM {orders}
+                    WHERE user_id=? AND id < ?
+                """, (row["user_id"], row["id"])).fetchall()
+                others = {h["product_id"] for h in history}
+                if row["product_id"] in others:
+                    continue
+                for other in others:
+                    for key in ((row["product_id"], other), (other, row["product_id"])):
+                        pairs[key] = pairs.get(key, 0) + 1
+
+            # 쓰기 잠금을 잡은 뒤 기준점이 그대로인지 다시 확인
+            # (동시에 돈 실행이 먼저 반영했거나 --full 로 초기화됐으면 이 배치는 버리고 다시 읽음)
+            conn.execute("BEGIN IMMEDIATE")
+            if int(get_state(conn, "recs_last_order_id", 0)) != last_id:
+                conn.rollback()
+                continue
+            conn.executemany("""
+                INSERT INTO product_pairs (product_id, other_id, score) VALUES (?, ?, ?)
+                ON CONFLICT(product_id, other_id) DO UPDATE SET score = score + excluded.score
+            """, [(a, b, n) for (a, b), n in pairs.items()])
+            set_state(conn, "recs_last_order_id", rows[-1]["id"])
+            conn.commit()
+            processed += len(rows)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return processed
+
 
+def rebuild_recommendations() -> int:
+    conn = get_db()
+    conn.execute("DELETE FROM product_pairs")
+    set_state(conn, "recs_last_order_id", 0)
     conn.commit()
     conn.close()
+    return update_recommendations()
+
 
+def recommended_products(conn, product_ids, limit: int = RECS_LIMIT):
+    """주어진 상품들과 함께 많이 구매된 상품 (주어진 상품 자체는 제외)"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return []
+    marks = ",".join("?" * len(product_ids))
+    return conn.execute(f"""
+        SELECT p.id, p.name, p.price, p.image, SUM(r.score) AS score
+        FROM product_pairs r
+        JOIN products p ON p.id = r.other_id
+        WHERE r.product_id IN ({marks}) AND r.other_id NOT IN ({marks})
+        GROUP BY p.id
+        ORDER BY score DESC
+        LIMIT ?
+    """, (*product_ids, *product_ids, limit)).fetchall()
 
-# 앱 import될 때도 항상 DB 보장
-init_db()
+
+@app.cli.command("rebuild-recs")
+@click.option("--full", is_flag=True, help="기존 집계를 지우고 처음부터 다시 계산")
+def rebuild_recs_command(full):
+    processed = rebuild_recommendations() if full else update_recommendations()
+    click.echo(f"추천 집계 완료: 주문 {processed}건 처리")
+
+
+# -----------------------------
+# 백그라운드 작업 (jobs 테이블 + worker 프로세스)
+# -----------------------------
+JOB_HANDLERS = {}
+
+# (작업 종류, 주기(초)) - worker 가 주기마다 큐에 넣음
+PERIODIC_JOBS = [
+    ("expire_reservations", 60),
+    ("prune_jobs", 3600),
+    ("refresh_snapshot", SNAPSHOT_INTERVAL),
+    ("update_recommendations", RECS_INTERVAL),
+]
+
+# 긴 쓰기 잠금 / 독점 잠금이 필요한 작업 - MAINTENANCE_WINDOW 시간대마다 한 번씩만 큐에 넣음
+WINDOWED_JOBS = ["archive", "maintenance"]
+
+
+def job_handler(kind: str):
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue_job(kind: str, payload=None, delay: int = 0, max_attempts: int = 5, conn=None):
+    """
+    conn 을 넘기면 호출하는 쪽 트랜잭션에 함께 묶임 (commit 도 호출자가)
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db()
+    cur = conn.execute("""
+        INSERT INTO jobs (kind, payload, max_attempts, run_at)
+        VALUES (?, ?, ?, ?)
+    """, (kind, json.dumps(payload or {}, ensure_ascii=False), max_attempts, _now_str(delay)))
+    if own_conn:
+        conn.commit()
+        conn.close()
+    # 요청 로그와 같은 request_id 로 남아서 어떤 요청이 만든 작업인지 추적 가능
+    log_event(logging.DEBUG, "job_enqueued", f"작업 등록: {kind}", job_id=cur.lastrowid, kind=kind)
+    return cur.lastrowid
+
+
+def claim_job(conn):
+    """
+    실행할 작업 하나를 running 으로 잡음
+    locked_until 이 지난 running 작업(죽은 worker)도 다시 가져감
+    """
+    now = _now_str()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        job = conn.execute("""
+            SELECT * FROM jobs
+            WHERE (status='queued' AND run_at <= ?)
+               OR (status='running' AND locked_until <= ?)
+            ORDER BY run_at, id
+            LIMIT 1
+        """, (now, now)).fetchone()
+        if job:
+            conn.execute("""
+                UPDATE jobs
+                SET status='running', attempts=attempts + 1,
+                    locked_until=?, started_at=?
+                WHERE id=?
+            """, (_now_str(JOB_VISIBILITY_TIMEOUT), now, job["id"]))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if job is None:
+        return None
+    return conn.execute("SELECT * FROM jobs WHERE id=?", (job["id"],)).fetchone()
+
+
+def run_job(conn, job):
+    """성공하면 done, 실패하면 지수 백오프로 재시도, 횟수 초과 시 failed"""
+    handler = JOB_HANDLERS.get(job["kind"])
+    request_id_var.set(f"job-{job['id']}")
+    started = time.perf_counter()
+    try:
+        if handler is None:
+            raise LookupError(f"알 수 없는 작업 종류: {job['kind']}")
+        handler(**json.loads(job["payload"] or "{}"))
+    except Exception as e:
+        if job["attempts"] >= job["max_attempts"]:
+            status, run_at = "failed", job["run_at"]
+        else:
+            status = "queued"
+            run_at = _now_str(JOB_BACKOFF_BASE * 2 ** (job["attempts"] - 1))
+        conn.execute("""
+            UPDATE jobs SET status=?, run_at=?, last_error=?, locked_until=NULL
+            WHERE id=? AND attempts=?
+        """, (status, run_at, repr(e), job["id"], job["attempts"]))
+        conn.commit()
+        log_event(
+            logging.ERROR if status == "failed" else logging.WARNING,
+            "job_failed", f"작업 실패: {job['kind']}",
+            job_id=job["id"], kind=job["kind"], attempts=job["attempts"],
+            status=status, error=repr(e)
+        )
+        return False
+
+    conn.execute("""
+        UPDATE jobs SET status='done', finished_at=?, locked_until=NULL
+        WHERE id=? AND attempts=?
+    """, (_now_str(), job["id"], job["attempts"]))
+    conn.commit()
+    log_event(
+        logging.INFO, "job_done", f"작업 완료: {job['kind']}",
+        job_id=job["id"], kind=job["kind"], attempts=job["attempts"],
+        duration_ms=(time.perf_counter() - started) * 1000
+    )
+    return True
+
+
+def maintenance_window_start(now=None):
+    """지금이 MAINTENANCE_WINDOW 안이면 이번 시간대의 시작 시각, 아니면 None"""
+    if not MAINTENANCE_WINDOW:
+        return None
+    now = now or datetime.now()
+    start, end = (
+        datetime.combine(now.date(), datetime.strptime(part.strip(), "%H:%M").time())
+        for part in MAINTENANCE_WINDOW.split("-")
+    )
+    if end <= start:  # 자정을 넘는 시간대 (예: 23:00-02:00)
+        if now < end:
+            start -= timedelta(days=1)
+        else:
+            end += timedelta(days=1)
+    return start if start <= now < end else None
+
+
+def schedule_periodic_jobs(conn):
+    """마지막으로 큐에 넣은 지 주기 이상 지난 작업만 추가 (worker 여러 개여도 중복 최소화)"""
+    def last_enqueued(kind):
+        return conn.execute(
+            "SELECT MAX(created_at) AS last FROM jobs WHERE kind=?",
+            (kind,)
+        ).fetchone()["last"]
+
+    for kind, interval in PERIODIC_JOBS:
+        last = last_enqueued(kind)
+        if last is None or last <= _now_str(-interval):
+            enqueue_job(kind, conn=conn)
+
+    window_start = maintenance_window_start()
+    if window_start is not None:
+        for kind in WINDOWED_JOBS:
+            last = last_enqueued(kind)
+            if last is None or last < window_start.strftime("%Y-%m-%d %H:%M:%S"):
+                enqueue_job(kind, conn=conn)
+    conn.commit()
+
+
+def prune_jobs(conn=None, days: int = JOB_RETENTION_DAYS) -> int:
+    """days 일보다 오래된 done/failed 작업 삭제. 삭제한 수 반환"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db()
+    try:
+        cur = conn.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND created_at < ?",
+            (_now_str(-int(days) * 86400),)
+        )
+        conn.commit()
+        return cur.rowcount
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def work(once: bool = False):
+    """모든 테넌트의 큐를 돌아가며 하나씩 처리"""
+    last_schedule = 0.0
+    while True:
+        schedule = time.monotonic() - last_schedule >= JOB_POLL_INTERVAL * 5
+        if schedule:
+            last_schedule = time.monotonic()
+
+        ran = 0
+        for tenant in all_tenants():
+            with use_tenant(tenant):
+                conn = get_db()
+                try:
+                    if schedule:
+                        schedule_periodic_jobs(conn)
+                    job = claim_job(conn)
+                    if job is not None:
+                        run_job(conn, job)
+                        ran += 1
+                finally:
+                    conn.close()
+
+        if ran:
+            continue
+        if once:
+            break
+        time.sleep(JOB_POLL_INTERVAL)
+
+
+def job_metrics(conn):
+    depth = {
+        row["status"]: row["cnt"]
+        for row in conn.execute("SELECT status, COUNT(*) AS cnt FROM jobs GROUP BY status")
+    }
+    oldest = conn.execute("""
+        SELECT (julianday('now','localtime') - julianday(MIN(run_at))) * 86400 AS age
+        FROM jobs WHERE status='queued' AND run_at <= ?
+    """, (_now_str(),)).fetchone()["age"]
+    # 최근 1시간 동안 끝난 작업: 대기 시간(예정 -> 시작), 실행 시간(시작 -> 종료)
+    latency = conn.execute("""
+        SELECT AVG((julianday(started_at) - julianday(run_at)) * 86400) AS wait,
+               AVG((julianday(finished_at) - julianday(started_at)) * 86400) AS run
+        FROM jobs
+        WHERE status='done' AND finished_at >= ?
+    """, (_now_str(-3600),)).fetchone()
+    return {
+        "depth": depth,
+        "oldest_queued_seconds": oldest or 0,
+        "avg_wait_seconds": latency["wait"] or 0,
+        "avg_run_seconds": latency["run"] or 0,
+    }
+
+
+@job_handler("send_email")
+def _send_email_job(to_email, subject, body):
+    deliver_email(to_email, subject, body)
+
+
+@job_handler("expire_reservations")
+def _expire_reservations_job():
+    expire_reservations()
+
+
+@job_handler("archive")
+def _archive_job(days=ARCHIVE_AFTER_DAYS):
+    archive_old_records(days)
+
+
+@job_handler("maintenance")
+def _maintenance_job():
+    db_maintenance()
+
+
+@job_handler("prune_jobs")
+def _prune_jobs_job():
+    prune_jobs()
+
+
+@job_handler("refresh_snapshot")
+def _refresh_snapshot_job():
+    refresh_snapshot()
+
+
+@job_handler("update_recommendations")
+def _update_recommendations_job():
+    update_recommendations()
+
+
+@app.cli.command("run-worker")
+@click.option("--once", is_flag=True, help="큐가 빌 때까지만 실행하고 종료")
+def run_worker_command(once):
+    click.echo(f"worker 시작 (작업 종류: {', '.join(sorted(JOB_HANDLERS))})")
+    work(once)
+
+
+@app.route("/admin/jobs/metrics")
+def admin_job_metrics():
+    if not admin_required():
+        return redirect(url_for("admin_login"))
+    conn = get_db()
+    return jsonify(job_metrics(conn))
+
+
+# -----------------------------
+# 헬스 체크 (/healthz, /readyz)
+# -----------------------------
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+@app.before_request
+def _track_request_start():
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight += 1
+    g.tracked_in_flight = True
+
+
+@app.teardown_request
+def _track_request_end(exc):
+    global _in_flight
+    if g.pop("tracked_in_flight", False):
+        with _in_flight_lock:
+            _in_flight -= 1
+
+
+def check_readiness():
+    """
+    DB 연결/지연, 스키마 버전, 동시 요청 포화도, 작업 큐 적체 확인
+    읽기 전용으로만 확인 (DB 파일 생성/마이그레이션은 release 단계의 flask migrate 몫)
+    """
+    tenant = current_tenant()
+    body = {"status": "ok", "tenant": tenant.key, "checked_at": _now_str()}
+    ready = True
+
+    if not os.path.exists(tenant.db_path):
+        body["db"] = {"ok": False, "error": "database file not found"}
+        ready = False
+    else:
+        try:
+            started = time.perf_counter()
+            conn = _connect()
+            try:
+                conn.execute("PRAGMA query_only = ON")
+                conn.execute("SELECT 1").fetchone()
+                latency_ms = (time.perf_counter() - started) * 1000
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                queued = None
+                if version >= SCHEMA_VERSION:
+                    queued = conn.execute(
+                        "SELECT COUNT(*) AS cnt FROM jobs WHERE status='queued'"
+                    ).fetchone()["cnt"]
+            finally:
+                conn.close()
+            body["db"] = {"ok": True, "latency_ms": round(latency_ms, 2)}
+            body["migration"] = {"version": version, "expected": SCHEMA_VERSION}
+            body["jobs"] = {"queued": queued}
+            if version < SCHEMA_VERSION:
+                ready = False
+        except sqlite3.Error as e:
+            body["db"] = {"ok": False, "error": repr(e)}
+            ready = False
+
+    # 자기 자신(/readyz 요청)은 빼고 계산
+    busy = max(_in_flight - 1, 0)
+    body["pool"] = {
+        "in_flight": busy,
+        "capacity": WEB_THREADS,
+        "saturation": round(busy / WEB_THREADS, 2) if WEB_THREADS else None,
+    }
+
+    if not ready:
+        body["status"] = "unavailable"
+    return body, 200 if ready else 503
+
+
+@app.route("/healthz")
+def healthz():
+    # 프로세스가 살아서 요청을 받는지만 확인 (DB 안 건드림)
+    return jsonify(status="ok")
+
+
+def cached_readiness():
+    """
+    HEALTH_CACHE_SECONDS 동안은 마지막 결과 재사용
+    여러 프로브가 동시에 와도 DB 확인은 한 스레드만 수행
+    """
+    tenant = current_tenant()
+    cache = tenant.readiness
+    if time.monotonic() - cache["at"] >= HEALTH_CACHE_SECONDS:
+        with tenant.readiness_lock:
+            if time.monotonic() - cache["at"] >= HEALTH_CACHE_SECONDS:
+                cache["body"], cache["status"] = check_readiness()
+                cache["at"] = time.monotonic()
+    return cache["body"], cache["status"]
+
+
+@app.route("/readyz")
+def readyz():
+    """
+    Host 로 상점이 정해지면 그 상점만 확인
+    멀티 테넌트에서 Host 가 상점이 아니면(파드 IP 프로브) ?tenant=<host> 상점,
+    없으면 설정된 모든 상점을 확인해서 하나라도 준비 안 됐으면 503
+    """
+    if not TENANT_CONFIG or tenant_var.get() is not None:
+        body, status = cached_readiness()
+        return jsonify(body), status
+
+    key = request.args.get("tenant", "").lower()
+    if key:
+        if key not in TENANT_CONFIG:
+            abort(404)
+        with use_tenant(get_tenant(key)):
+            body, status = cached_readiness()
+        return jsonify(body), status
+
+    results = {}
+    for tenant in all_tenants():
+        with use_tenant(tenant):
+            results[tenant.key] = cached_readiness()
+    ready = all(status == 200 for _, status in results.values())
+    return jsonify(
+        status="ok" if ready else "unavailable",
+        tenants={key: body for key, (body, _) in results.items()}
+    ), 200 if ready else 503
 
 
 # -----------------------------
@@ -207,17 +1687,25 @@ init_db()
 @app.route("/")
 def index():
     conn = get_db()
-    products = conn.execute("SELECT * FROM products ORDER BY id DESC").fetchall()
+    products = get_catalog(conn)
 
     balance = None
+    wishlist_ids, cart_ids = set(), set()
     if login_required():
         user = conn.execute(
             "SELECT balance FROM users WHERE id=?",
             (session["user_id"],)
         ).fetchone()
         balance = user["balance"] if user else 0
+        wishlist_ids, cart_ids = get_membership(conn, session["user_id"])
 
-    return render_template("index.html", products=products, balance=balance)
+    return render_template(
+        "index.html",
+        products=products,
+        balance=balance,
+        wishlist_ids=wishlist_ids,
+        cart_ids=cart_ids
+    )
 
 
 # -----------------------------
@@ -260,6 +1748,7 @@ def login():
             session["user_id"] = user["id"]
             session["username"] = user["username"]
             session["is_admin"] = user["is_admin"]
+            session["tenant"] = current_tenant().key
             flash("로그인 성공!")
 
             if user["is_admin"] == 1:
@@ -292,10 +1781,7 @@ def mypage():
         (uid,)
     ).fetchone()
 
-    order_count = conn.execute(
-        "SELECT COUNT(*) AS cnt FROM orders WHERE user_id=?",
-        (uid,)
-    ).fetchone()["cnt"]
+    order_count = count_with_archive(conn, "orders", "user_id=?", (uid,))
 
     return render_template(
         "mypage.html",
@@ -321,7 +1807,8 @@ def cart():
     """, (session["user_id"],)).fetchall()
 
     total = sum(row["price"] for row in rows) if rows else 0
-    return render_template("cart.html", items=rows, total=total)
+    recommendations = recommended_products(conn, {row["product_id"] for row in rows})
+    return render_template("cart.html", items=rows, total=total, recommendations=recommendations)
 
 
 @app.route("/cart/add/<int:pid>")
@@ -381,6 +1868,21 @@ def cart_checkout():
         flash("잔액이 부족합니다. 충전 후 이용해주세요.")
         return redirect(url_for("recharge"))
 
+    # 재고 차감 (하나라도 부족하면 전체 취소)
+    quantities = {}
+    for row in items:
+        quantities[row["product_id"]] = quantities.get(row["product_id"], 0) + 1
+    try:
+        for pid, qty in quantities.items():
+            reservation_id = reserve_stock(conn, uid, pid, qty)
+            if reservation_id is not None:
+                commit_reservation(conn, reservation_id)
+    except OutOfStock as e:
+        conn.rollback()
+        name = next(row["name"] for row in items if row["product_id"] == e.args[0])
+        flash(f"'{name}' 상품의 재고가 부족합니다.")
+        return redirect(url_for("cart"))
+
     # 주문 생성
     for row in items:
         conn.execute("""
@@ -432,16 +1934,13 @@ def add_wishlist(pid):
     if not login_required():
         return redirect(url_for("login"))
     conn = get_db()
-    exist = conn.execute("""
-        SELECT id FROM wishlist
-        WHERE user_id=? AND product_id=?
-    """, (session["user_id"], pid)).fetchone()
-    if not exist:
-        conn.execute(
-            "INSERT INTO wishlist (user_id, product_id) VALUES (?, ?)",
-            (session["user_id"], pid)
-        )
-        conn.commit()
+    # (user_id, product_id) 유니크 인덱스로 중복은 DB가 무시
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO wishlist (user_id, product_id) VALUES (?, ?)",
+        (session["user_id"], pid)
+    )
+    conn.commit()
+    if cur.rowcount:
         flash("찜 목록에 추가되었습니다.")
     else:
         flash("이미 찜 목록에 있는 상품입니다.")
@@ -470,15 +1969,16 @@ def orders():
     if not login_required():
         return redirect(url_for("login"))
     conn = get_db()
-    rows = conn.execute("""
+    page = max(request.args.get("page", 1, type=int), 1)
+    rows, has_next = fetch_history_page(conn, """
         SELECT o.id, o.status, o.created_at,
                p.name AS product_name, p.price
-        FROM orders o
+        FROM {table} o
         JOIN products p ON o.product_id = p.id
         WHERE o.user_id=?
         ORDER BY o.id DESC
-    """, (session["user_id"],)).fetchall()
-    return render_template("orders.html", orders=rows)
+    """, (session["user_id"],), "orders", page)
+    return render_template("orders.html", orders=rows, page=page, has_next=has_next)
 
 
 # -----------------------------
@@ -496,21 +1996,36 @@ def order(product_id):
     if not product:
         return "상품을 찾을 수 없습니다.", 404
 
+    uid = session["user_id"]
+    limited = product["stock"] is not None
+
     if request.method == "POST":
         phone = request.form.get("phone", "").strip()
         receipt = request.files.get("receipt")
 
+        # 구매 시작(order_reserve)에서 잡아둔 예약을 확정 (만료됐으면 다시 예약 시도)
+        if limited:
+            reservation_id = find_reservation(conn, uid, product_id)
+            try:
+                if reservation_id is None or not commit_reservation(conn, reservation_id):
+                    commit_reservation(conn, reserve_stock(conn, uid, product_id))
+            except OutOfStock:
+                conn.rollback()
+                flash("품절된 상품입니다.")
+                return redirect(url_for("index"))
+
         receipt_filename = None
         if receipt and allowed_file(receipt.filename):
             filename = secure_filename(receipt.filename)
             receipt_filename = f"receipt_{product_id}_{filename}"
-            receipt.save(os.path.join(UPLOAD_FOLDER, receipt_filename))
+            receipt.save(upload_path(receipt_filename))
 
         # DB에 주문 저장
-        conn.execute("""
+        cur = conn.execute("""
             INSERT INTO orders (user_id, product_id, phone, receipt, status)
             VALUES (?, ?, ?, ?, 'pending')
-        """, (session["user_id"], product_id, phone, receipt_filename))
+        """, (uid, product_id, phone, receipt_filename))
+        order_id = cur.lastrowid
         conn.commit()
 
         # 관리자/사용자에게 메일
@@ -519,7 +2034,7 @@ def order(product_id):
 
         # 관리자용 메일
         body_admin = (
-            f"[{SHOP_NAME}] 새 구매 요청이 도착했습니다.\n\n"
+            f"[{shop_name()}] 새 구매 요청이 도착했습니다.\n\n"
             f"상품명: {product['name']}\n"
             f"가격: {product['price']}원\n"
             f"구매자: {session.get('username')}\n"
@@ -527,23 +2042,52 @@ def order(product_id):
             f"영수증 파일명: {receipt_filename if receipt_filename else '없음'}\n"
         )
         if admin_email:
-            send_email(admin_email, f"[{SHOP_NAME}] 새 구매 요청", body_admin)
+            send_email(admin_email, f"[{shop_name()}] 새 구매 요청", body_admin)
 
         # 사용자용 메일 (선택적)
         if user_email:
             body_user = (
-                f"[{SHOP_NAME}] 구매 요청이 접수되었습니다.\n\n"
+                f"[{shop_name()}] 구매 요청이 접수되었습니다.\n\n"
                 f"상품명: {product['name']}\n"
                 f"가격: {product['price']}원\n"
                 f"입력하신 전화번호: {phone}\n\n"
                 "관리자가 확인 후 별도로 안내드립니다."
             )
-            send_email(user_email, f"[{SHOP_NAME}] 구매 요청 접수 안내", body_user)
+            send_email(user_email, f"[{shop_name()}] 구매 요청 접수 안내", body_user)
 
         flash("구매 요청이 전송되었습니다! 관리자가 확인 후 처리합니다.")
-        return redirect(url_for("order_complete", order_id=conn.execute("SELECT last_insert_rowid() AS id").fetchone()["id"]))
+        return redirect(url_for("order_complete", order_id=order_id))
 
-    return render_template("order.html", product=product)
+    # 페이지를 보는 것만으로는 예약하지 않음 (재고 한정 상품은 "구매 시작" POST 에서 예약)
+    needs_reservation = limited and find_reservation(conn, uid, product_id) is None
+    sold_out = needs_reservation and product["stock"] < 1
+
+    recommendations = recommended_products(conn, [product_id])
+    return render_template(
+        "order.html",
+        product=product,
+        sold_out=sold_out,
+        needs_reservation=needs_reservation,
+        reservation_minutes=RESERVATION_TTL // 60,
+        recommendations=recommendations
+    )
+
+
+@app.route("/order/<int:product_id>/reserve", methods=["POST"])
+def order_reserve(product_id):
+    """결제 시작: 재고 한정 상품을 RESERVATION_TTL 동안 1개 예약 (사용자당 상품별 1건)"""
+    if not login_required():
+        return redirect(url_for("login"))
+    conn = get_db()
+    uid = session["user_id"]
+    if find_reservation(conn, uid, product_id) is None:
+        try:
+            reserve_stock(conn, uid, product_id)
+            conn.commit()
+        except OutOfStock:
+            conn.rollback()
+            flash("품절된 상품입니다.")
+    return redirect(url_for("order", product_id=product_id))
 
 
 @app.route("/order_complete/<int:order_id>")
@@ -584,14 +2128,14 @@ def recharge():
             flash("올바른 금액을 입력해주세요.")
             return redirect(url_for("recharge"))
 
-        conn.execute("""
+        cur = conn.execute("""
             INSERT INTO recharge_requests (user_id, amount, status)
             VALUES (?, ?, 'pending')
         """, (uid, amount))
         conn.execute("""
-            INSERT INTO transactions (user_id, type, amount, description, status)
-            VALUES (?, 'recharge_request', ?, '충전 요청', 'pending')
-        """, (uid, amount))
+            INSERT INTO transactions (user_id, type, amount, description, status, request_id)
+            VALUES (?, 'recharge_request', ?, '충전 요청', 'pending', ?)
+        """, (uid, amount, cur.lastrowid))
         conn.commit()
 
         # 관리자 & 사용자에게 메일
@@ -600,19 +2144,19 @@ def recharge():
 
         if admin_email:
             body_admin = (
-                f"[{SHOP_NAME}] 새 충전 요청\n\n"
+                f"[{shop_name()}] 새 충전 요청\n\n"
                 f"사용자: {session.get('username')}\n"
                 f"금액: {amount}원\n"
             )
-            send_email(admin_email, f"[{SHOP_NAME}] 충전 요청", body_admin)
+            send_email(admin_email, f"[{shop_name()}] 충전 요청", body_admin)
 
         if user_email:
             body_user = (
-                f"[{SHOP_NAME}] 충전 요청이 접수되었습니다.\n\n"
+                f"[{shop_name()}] 충전 요청이 접수되었습니다.\n\n"
                 f"요청 금액: {amount}원\n"
                 "관리자가 확인 후 승인하면 잔액에 반영됩니다."
             )
-            send_email(user_email, f"[{SHOP_NAME}] 충전 요청 접수 안내", body_user)
+            send_email(user_email, f"[{shop_name()}] 충전 요청 접수 안내", body_user)
 
         flash("충전 요청이 전송되었습니다.")
         return redirect(url_for("recharge"))
@@ -657,14 +2201,14 @@ def refund():
             flash("올바른 환불 금액을 입력해주세요. (잔액 이내)")
             return redirect(url_for("refund"))
 
-        conn.execute("""
+        cur = conn.execute("""
             INSERT INTO refund_requests (user_id, amount, status)
             VALUES (?, ?, 'pending')
         """, (uid, amount))
         conn.execute("""
-            INSERT INTO transactions (user_id, type, amount, description, status)
-            VALUES (?, 'refund_request', ?, '환불 요청', 'pending')
-        """, (uid, amount))
+            INSERT INTO transactions (user_id, type, amount, description, status, request_id)
+            VALUES (?, 'refund_request', ?, '환불 요청', 'pending', ?)
+        """, (uid, amount, cur.lastrowid))
         conn.commit()
 
         # 관리자 / 사용자 메일 (옵션)
@@ -673,19 +2217,19 @@ def refund():
 
         if admin_email:
             body_admin = (
-                f"[{SHOP_NAME}] 새 환불 요청\n\n"
+                f"[{shop_name()}] 새 환불 요청\n\n"
                 f"사용자: {session.get('username')}\n"
                 f"금액: {amount}원\n"
             )
-            send_email(admin_email, f"[{SHOP_NAME}] 환불 요청", body_admin)
+            send_email(admin_email, f"[{shop_name()}] 환불 요청", body_admin)
 
         if user_email:
             body_user = (
-                f"[{SHOP_NAME}] 환불 요청이 접수되었습니다.\n\n"
+                f"[{shop_name()}] 환불 요청이 접수되었습니다.\n\n"
                 f"요청 금액: {amount}원\n"
                 "관리자가 확인 후 처리됩니다."
             )
-            send_email(user_email, f"[{SHOP_NAME}] 환불 요청 접수 안내", body_user)
+            send_email(user_email, f"[{shop_name()}] 환불 요청 접수 안내", body_user)
 
         flash("환불 요청이 전송되었습니다.")
         return redirect(url_for("refund"))
@@ -705,13 +2249,14 @@ def transactions():
     if not login_required():
         return redirect(url_for("login"))
     conn = get_db()
-    rows = conn.execute("""
+    page = max(request.args.get("page", 1, type=int), 1)
+    rows, has_next = fetch_history_page(conn, """
         SELECT id, type, amount, description, status, created_at
-        FROM transactions
+        FROM {table}
         WHERE user_id=?
         ORDER BY id DESC
-    """, (session["user_id"],)).fetchall()
-    return render_template("transactions.html", rows=rows)
+    """, (session["user_id"],), "transactions", page)
+    return render_template("transactions.html", rows=rows, page=page, has_next=has_next)
 
 
 # -----------------------------
@@ -732,6 +2277,7 @@ def admin_login():
             session["user_id"] = user["id"]
             session["username"] = user["username"]
             session["is_admin"] = user["is_admin"]
+            session["tenant"] = current_tenant().key
             flash("관리자 로그인 성공!")
             return redirect(url_for("admin_dashboard"))
         else:
@@ -749,9 +2295,7 @@ def admin_dashboard():
         "SELECT COUNT(*) AS cnt FROM products"
     ).fetchone()["cnt"]
 
-    order_count = conn.execute(
-        "SELECT COUNT(*) AS cnt FROM orders"
-    ).fetchone()["cnt"]
+    order_count = count_with_archive(conn, "orders")
 
     pending_recharges = conn.execute(
         "SELECT COUNT(*) AS cnt FROM recharge_requests WHERE status='pending'"
@@ -761,6 +2305,10 @@ def admin_dashboard():
         "SELECT COUNT(*) AS cnt FROM refund_requests WHERE status='pending'"
     ).fetchone()["cnt"]
 
+    queued_jobs = conn.execute(
+        "SELECT COUNT(*) AS cnt FROM jobs WHERE status='queued'"
+    ).fetchone()["cnt"]
+
     products = conn.execute(
         "SELECT * FROM products ORDER BY id DESC"
     ).fetchall()
@@ -771,10 +2319,63 @@ def admin_dashboard():
         order_count=order_count,
         pending_recharges=pending_recharges,
         pending_refunds=pending_refunds,
+        queued_jobs=queued_jobs,
         products=products
     )
 
 
+@app.route("/admin/report")
+def admin_report():
+    if not admin_required():
+        return redirect(url_for("admin_login"))
+    conn = get_snapshot_db()
+    since = _now_str(-REPORT_DAYS * 24 * 3600)
+
+    daily = conn.execute("""
+        SELECT date(created_at) AS day, SUM(amount) AS revenue, COUNT(*) AS cnt
+        FROM transactions
+        WHERE type='purchase' AND status='completed' AND created_at >= ?
+        GROUP BY day
+        ORDER BY day DESC
+    """, (since,)).fetchall()
+
+    top_products = conn.execute("""
+        SELECT p.id, p.name, COUNT(*) AS cnt, SUM(p.price) AS sales
+        FROM orders o
+        JOIN products p ON o.product_id = p.id
+        WHERE o.created_at >= ?
+        GROUP BY p.id
+        ORDER BY cnt DESC
+        LIMIT 10
+    """, (since,)).fetchall()
+
+    refunded = conn.execute("""
+        SELECT COALESCE(SUM(amount), 0) AS amount, COUNT(*) AS cnt
+        FROM refund_requests
+        WHERE status='approved' AND created_at >= ?
+    """, (since,)).fetchone()
+    conn.close()
+
+    revenue = sum(row["revenue"] for row in daily)
+    refund_rate = refunded["amount"] / revenue * 100 if revenue else 0
+
+    snapshot_at = None
+    snapshot_path = current_tenant().snapshot_path
+    if os.path.exists(snapshot_path):
+        snapshot_at = datetime.fromtimestamp(os.path.getmtime(snapshot_path)).strftime("%Y-%m-%d %H:%M:%S")
+
+    return render_template(
+        "admin_report.html",
+        days=REPORT_DAYS,
+        daily=daily,
+        top_products=top_products,
+        revenue=revenue,
+        refunded=refunded,
+        refund_rate=refund_rate,
+        snapshot_at=snapshot_at
+    )
+
+
 # -----------------------------
 # 관리자: 상품 관리
 # -----------------------------
@@ -788,6 +2389,7 @@ def admin_add():
         price_str = request.form.get("price", "0").strip()
         desc = request.form.get("desc", "").strip()
         image_url = request.form.get("image_url", "").strip()
+        stock_str = request.form.get("stock", "").strip()
         file = request.files.get("image_file")
 
         try:
@@ -799,11 +2401,16 @@ def admin_add():
             flash("상품명과 가격을 올바르게 입력하세요.")
             return redirect(url_for("admin_add"))
 
+        # 빈 값이면 재고 무제한
+        if stock_str and not stock_str.isdigit():
+            flash("재고는 0 이상의 숫자로 입력하세요.")
+            return redirect(url_for("admin_add"))
+        stock = int(stock_str) if stock_str else None
+
         image_path = ""
         if file and file.filename and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            save_path = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(save_path)
+            file.save(upload_path(filename))
             # /uploads/... 으로 접근
             image_path = f"/uploads/{filename}"
         elif image_url:
@@ -811,10 +2418,11 @@ def admin_add():
 
         conn = get_db()
         conn.execute("""
-            INSERT INTO products (name, price, description, image)
-            VALUES (?, ?, ?, ?)
-        """, (name, price, desc, image_path))
+            INSERT INTO products (name, price, description, image, stock)
+            VALUES (?, ?, ?, ?, ?)
+        """, (name, price, desc, image_path, stock))
         conn.commit()
+        invalidate_catalog()
         flash("상품이 등록되었습니다.")
         return redirect(url_for("admin_dashboard"))
 
@@ -828,10 +2436,316 @@ def admin_delete(pid):
     conn = get_db()
     conn.execute("DELETE FROM products WHERE id=?", (pid,))
     conn.commit()
+    invalidate_catalog()
     flash("상품이 삭제되었습니다.")
     return redirect(url_for("admin_dashboard"))
 
 
+# -----------------------------
+# 관리자: 상품 일괄 등록 / 내보내기 (CSV, JSONL)
+# -----------------------------
+def iter_product_rows(text_stream, fmt: str):
+    """파일 전체를 메모리에 올리지 않고 (줄 번호, dict) 를 한 줄씩 반환"""
+    if fmt == "jsonl":
+        for line_no, line in enumerate(text_stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_no, None
+                continue
+            yield line_no, row if isinstance(row, dict) else None
+    else:
+        reader = csv.DictReader(text_stream)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def validate_product_row(row):
+    if row is None:
+        raise ValueError("형식이 올바르지 않습니다")
+
+    name = str(row.get("name") or "").strip()
+    try:
+        price = int(str(row.get("price") or "0").strip())
+    except ValueError:
+        price = 0
+    if not name or price <= 0:
+        raise ValueError("상품명과 가격을 올바르게 입력하세요")
+
+    desc = str(row.get("description") or "").strip()
+    image = str(row.get("image") or "").strip()
+
+    stock = str(row.get("stock") if row.get("stock") is not None else "").strip()
+    try:
+        stock = int(stock) if stock else None
+    except ValueError:
+        raise ValueError("재고는 숫자여야 합니다")
+    if stock is not None and stock < 0:
+        raise ValueError("재고는 0 이상이어야 합니다")
+    return [name, price, desc, image, stock]
+
+
+def fetch_remote_image(url: str) -> str:
+    """
+    원격 이미지를 uploads/ 에 저장하고 /uploads/... 경로 반환
+    실패하면 원래 URL 그대로 사용
+    """
+    parsed = urlparse(url)
+    ext = parsed.path.rsplit(".", 1)[-1].lower() if "." in parsed.path else ""
+    if parsed.scheme not in ("http", "https") or ext not in ALLOWED_EXTENSIONS:
+        return url
+
+    filename = f"import_{hashlib.sha1(url.encode()).hexdigest()[:16]}.{ext}"
+    save_path = upload_path(filename)
+    if not os.path.exists(save_path):
+        try:
+            with urllib.request.urlopen(url, timeout=10) as resp:
+                data = resp.read(MAX_IMAGE_BYTES + 1)
+        except Exception as e:
+            log_event(logging.WARNING, "image_fetch_failed", "이미지 다운로드 실패", url=url, error=repr(e))
+            return url
+        if len(data) > MAX_IMAGE_BYTES:
+            return url
+        with open(save_path, "wb") as f:
+            f.write(data)
+    return f"/uploads/{filename}"
+
+
+def import_products(text_stream, fmt: str = "csv", fetch_images: bool = False, progress=None):
+    """
+    IMPORT_BATCH_SIZE 단위로 executemany + commit
+    반환: (등록 건수, [(줄 번호, 오류 메시지), ...])
+    """
+    conn = get_db()
+    inserted = 0
+    errors = []
+    batch = []
+    pool = ThreadPoolExecutor(max_workers=IMAGE_FETCH_WORKERS) if fetch_images else None
+
+    def flush():
+        nonlocal inserted
+        if pool:
+            # 배치 단위로만 다운로드를 걸어서 동시에 떠 있는 작업 수를 제한
+            images = pool.map(fetch_remote_image, [row[3] for row in batch])
+            for row, image in zip(batch, images):
+                row[3] = image
+        conn.executemany("""
+            INSERT INTO products (name, price, description, image, stock)
+            VALUES (?, ?, ?, ?, ?)
+        """, batch)
+        conn.commit()
+        invalidate_catalog()
+        inserted += len(batch)
+        batch.clear()
+
+    try:
+        line_no = 0
+        for line_no, row in iter_product_rows(text_stream, fmt):
+            try:
+                batch.append(validate_product_row(row))
+            except ValueError as e:
+                errors.append((line_no, str(e)))
+                continue
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush()
+                if progress:
+                    progress(inserted, line_no)
+        if batch:
+            flush()
+            if progress:
+                progress(inserted, line_no)
+    finally:
+        if pool:
+            pool.shutdown()
+        conn.close()
+
+    return inserted, errors
+
+
+def iter_csv(header, rows, chunk_size: int = 64 * 1024):
+    """rows 를 CSV로 쓰면서 chunk_size 만큼 모일 때마다 내보냄 (메모리 일정)"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(tuple(row))
+        if buf.tell() > chunk_size:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def export_products(fmt: str = "csv"):
+    """커서를 순회하면서 한 줄씩 내보내는 제너레이터"""
+    conn = get_db()
+    try:
+        cur = conn.execute(
+            "SELECT id, name, price, description, image, stock FROM products ORDER BY id"
+        )
+        if fmt == "jsonl":
+            for row in cur:
+                yield json.dumps(dict(row), ensure_ascii=False) + "\n"
+        else:
+            yield from iter_csv(("id",) + PRODUCT_FIELDS, cur)
+    finally:
+        conn.close()
+
+
+def guess_import_format(filename: str) -> str:
+    return "jsonl" if filename.lower().endswith((".jsonl", ".json", ".ndjson")) else "csv"
+
+
+@app.route("/admin/products/export")
+def admin_products_export():
+    if not admin_required():
+        return redirect(url_for("admin_login"))
+    fmt = "jsonl" if request.args.get("format") == "jsonl" else "csv"
+    mimetype = "application/x-ndjson" if fmt == "jsonl" else "text/csv"
+    return Response(
+        stream_for_tenant(export_products(fmt)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=products.{fmt}"}
+    )
+
+
+@app.route("/admin/products/import", methods=["POST"])
+def admin_products_import():
+    if not admin_required():
+        return redirect(url_for("admin_login"))
+
+    file = request.files.get("import_file")
+    if not file or not file.filename:
+        flash("가져올 파일을 선택하세요.")
+        return redirect(url_for("admin_add"))
+
+    text_stream = io.TextIOWrapper(file.stream, encoding="utf-8-sig", newline="")
+    inserted, errors = import_products(
+        text_stream,
+        guess_import_format(file.filename),
+        fetch_images=request.form.get("fetch_images") == "1"
+    )
+
+    flash(f"상품 {inserted}건이 등록되었습니다.")
+    if errors:
+        detail = ", ".join(f"{line}행: {msg}" for line, msg in errors[:10])
+        flash(f"오류 {len(errors)}건 - {detail}")
+    return redirect(url_for("admin_dashboard"))
+
+
+@app.cli.command("import-products")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), default=None)
+@click.option("--fetch-images", is_flag=True, help="원격 이미지 URL을 uploads/ 로 다운로드")
+def import_products_command(path, fmt, fetch_images):
+    fmt = fmt or guess_import_format(path)
+
+    def progress(inserted, line_no):
+        click.echo(f"{line_no}행까지 처리, {inserted}건 등록")
+
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        inserted, errors = import_products(f, fmt, fetch_images, progress)
+
+    for line_no, msg in errors:
+        click.echo(f"{line_no}행: {msg}", err=True)
+    click.echo(f"완료: {inserted}건 등록, 오류 {len(errors)}건")
+
+
+@app.cli.command("export-products")
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), default="csv")
+@click.option("-o", "--output", type=click.File("w", encoding="utf-8"), default="-")
+def export_products_command(fmt, output):
+    for chunk in export_products(fmt):
+        output.write(chunk)
+
+
+# -----------------------------
+# 관리자: 회계용 주문/거래 내역 CSV 내보내기
+# -----------------------------
+EXPORT_QUERIES = {
+    "orders": (
+        ("id", "user_id", "username", "product_id", "product_name", "price",
+         "phone", "status", "created_at"),
+        """
+        SELECT o.id, o.user_id, u.username, o.product_id, p.name, p.price,
+               o.phone, o.status, o.created_at
+        FROM {table} o
+        LEFT JOIN users u ON o.user_id = u.id
+        LEFT JOIN products p ON o.product_id = p.id
+        WHERE o.created_at >= ? AND o.created_at < ?
+        """
+    ),
+    "transactions": (
+        ("id", "user_id", "username", "type", "amount", "description",
+         "status", "created_at"),
+        """
+        SELECT t.id, t.user_id, u.username, t.type, t.amount, t.description,
+               t.status, t.created_at
+        FROM {table} t
+        LEFT JOIN users u ON t.user_id = u.id
+        WHERE t.created_at >= ? AND t.created_at < ?
+        """
+    ),
+}
+
+
+def parse_date_range(date_from: str, date_to: str):
+    """YYYY-MM-DD 두 개를 [시작, 끝+1일) 문자열 범위로 변환"""
+    start = datetime.strptime(date_from, "%Y-%m-%d") if date_from else datetime(1970, 1, 1)
+    end = datetime.strptime(date_to, "%Y-%m-%d") if date_to else datetime(9999, 12, 30)
+    # 9999-12-31 에 하루를 더하면 OverflowError 이므로 상한에 맞춤
+    end = min(end, datetime(9999, 12, 30)) + timedelta(days=1)
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+
+def export_history(kind: str, start: str, end: str):
+    """
+    main + archive 내역을 한 커서로 순회하면서 CSV 청크를 내보냄
+    fetchall() 없이 sqlite 커서를 한 줄씩 읽기 때문에 메모리 사용량이 일정
+    """
+    header, sql = EXPORT_QUERIES[kind]
+    conn = get_db()
+    try:
+        parts = [sql.format(table=f"main.{kind}")]
+        params = [start, end]
+        if has_archive():
+            # attach 때 archive 스키마를 맞출 수 있으므로 query_only 는 그 뒤에
+            attach_archive(conn)
+            parts.append(sql.format(table=f"archive.{kind}"))
+            params += [start, end]
+        conn.execute("PRAGMA query_only = ON")
+        cur = conn.execute(" UNION ALL ".join(parts) + " ORDER BY 1", params)
+        yield from iter_csv(header, cur)
+    finally:
+        conn.close()
+
+
+@app.route("/admin/export/<kind>")
+def admin_export(kind):
+    if not admin_required():
+        return redirect(url_for("admin_login"))
+    if kind not in EXPORT_QUERIES:
+        return "지원하지 않는 내보내기 형식입니다.", 404
+
+    try:
+        start, end = parse_date_range(
+            request.args.get("from", "").strip(),
+            request.args.get("to", "").strip()
+        )
+    except ValueError:
+        flash("날짜는 YYYY-MM-DD 형식으로 입력하세요.")
+        return redirect(url_for("admin_dashboard"))
+
+    return Response(
+        stream_for_tenant(export_history(kind, start, end)),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={kind}.csv"}
+    )
+
+
 # -----------------------------
 # 관리자: 충전/환불 승인
 # -----------------------------
@@ -890,11 +2804,11 @@ def admin_recharge_approve(req_id):
     user_email = os.environ.get("USER_TEST_EMAIL")
     if user_email:
         body = (
-            f"[{SHOP_NAME}] 충전이 승인되었습니다.\n\n"
+            f"[{shop_name()}] 충전이 승인되었습니다.\n\n"
             f"충전 금액: {amount}원\n"
             "이용해주셔서 감사합니다."
         )
-        send_email(user_email, f"[{SHOP_NAME}] 충전 승인 안내", body)
+        send_email(user_email, f"[{shop_name()}] 충전 승인 안내", body)
 
     flash("충전이 승인되었습니다.")
     return redirect(url_for("admin_recharge"))
@@ -975,10 +2889,10 @@ def admin_refunds_approve(req_id):
     user_email = os.environ.get("USER_TEST_EMAIL")
     if user_email:
         body = (
-            f"[{SHOP_NAME}] 환불이 승인되었습니다.\n\n"
+            f"[{shop_name()}] 환불이 승인되었습니다.\n\n"
             f"환불 금액: {amount}원\n"
         )
-        send_email(user_email, f"[{SHOP_NAME}] 환불 승인 안내", body)
+        send_email(user_email, f"[{shop_name()}] 환불 승인 안내", body)
 
     flash("환불이 승인되었습니다.")
     return redirect(url_for("admin_refunds"))
@@ -989,5 +2903,10 @@ def admin_refunds_approve(req_id):
 # -----------------------------
 if __name__ == "__main__":
     # 로컬 테스트용
-    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 8080)), debug=True)
+    init_db()
+    create_app().run(
+        host="0.0.0.0",
+        port=int(os.environ.get("PORT", 8080)),
+        debug=APP_ENV != "production"
+    )
 
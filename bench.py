@@ -0,0 +1,264 @@
+"""
+DoveShop 벤치마크 모음
+
+  python bench.py startup [--runs 10]
+  python bench.py stock [--stock 100] [--workers 16] [--attempts 300]
+  python bench.py compress [--rows 500] [--reps 50]
+  python bench.py tenants [--counts 1,10,50,100] [--products 50] [--cache-size 32]
+
+모든 벤치마크는 임시 폴더의 DB(DB_PATH)로 돌기 때문에 shop.db 를 건드리지 않음
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import sqlite3
+import tempfile
+import time
+import gc
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_isolated(code: str, env_extra=None) -> dict:
+    """새 파이썬 프로세스에서 code 실행 후 마지막 줄의 JSON 결과를 반환"""
+    env = dict(os.environ, **(env_extra or {}))
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+# -----------------------------
+# 콜드 스타트: import + create_app() / 첫 요청
+# -----------------------------
+STARTUP_CODE = """
+import json, time
+t0 = time.perf_counter()
+import app as shop
+application = shop.create_app()
+t1 = time.perf_counter()
+application.test_client().get("/")
+t2 = time.perf_counter()
+print(json.dumps({"boot": t1 - t0, "first_request": t2 - t1}))
+"""
+
+
+def bench_startup(args):
+    boot, first = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.runs):
+            # 매번 새 DB: 첫 요청에 스키마 생성 비용이 포함되는 최악의 경우
+            db_path = os.path.join(tmp, f"startup_{i}.db")
+            result = run_isolated(STARTUP_CODE, {"DB_PATH": db_path})
+            boot.append(result["boot"])
+            first.append(result["first_request"])
+
+    print(f"startup ({args.runs} runs, median)")
+    print(f"  import + create_app(): {statistics.median(boot) * 1000:8.1f} ms")
+    print(f"  first request (/):     {statistics.median(first) * 1000:8.1f} ms")
+
+
+def load_shop(db_path: str):
+    """임시 DB 경로로 app 모듈을 import"""
+    os.environ["DB_PATH"] = db_path
+    sys.path.insert(0, BASE_DIR)
+    import app as shop
+    shop.create_app()
+    return shop
+
+
+# -----------------------------
+# 재고: 인기 상품 하나에 동시 결제 몰리기
+# -----------------------------
+def bench_stock(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        shop = load_shop(os.path.join(tmp, "stock.db"))
+        conn = shop.get_db()
+        pid = conn.execute(
+            "INSERT INTO products (name, price, description, image, stock) VALUES ('hot', 1000, '', '', ?)",
+            (args.stock,)
+        ).lastrowid
+        conn.commit()
+        conn.close()
+
+        def checkout(uid):
+            conn = shop.get_db()
+            try:
+                reservation_id = shop.reserve_stock(conn, uid, pid)
+                shop.commit_reservation(conn, reservation_id)
+                conn.execute(
+                    "INSERT INTO orders (user_id, product_id, status) VALUES (?, ?, 'paid')",
+                    (uid, pid)
+                )
+                conn.commit()
+                return "ok"
+            except shop.OutOfStock:
+                conn.rollback()
+                return "sold_out"
+            except sqlite3.OperationalError:
+                conn.rollback()
+                return "busy"
+            finally:
+                conn.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(checkout, range(1, args.attempts + 1)))
+        elapsed = time.perf_counter() - started
+
+        conn = shop.get_db()
+        sold = conn.execute("SELECT COUNT(*) FROM orders WHERE product_id=?", (pid,)).fetchone()[0]
+        left = conn.execute("SELECT stock FROM products WHERE id=?", (pid,)).fetchone()[0]
+        conn.close()
+
+    print(f"stock (stock={args.stock}, workers={args.workers}, attempts={args.attempts})")
+    print(f"  throughput:   {args.attempts / elapsed:8.1f} checkouts/s")
+    print(f"  ok / sold_out / busy: {results.count('ok')} / {results.count('sold_out')} / {results.count('busy')}")
+    print(f"  sold={sold} remaining={left}")
+    print(f"  oversell:     {max(0, sold - args.stock) + max(0, -left)}")
+
+
+# -----------------------------
+# 응답 압축: 라우트별 바이트 절감 / CPU 비용
+# -----------------------------
+def bench_compress(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        shop = load_shop(os.path.join(tmp, "compress.db"))
+        application = shop.app
+        conn = shop.get_db()
+        uid = conn.execute(
+            "INSERT INTO users (username, password, balance) VALUES ('bench', 'bench', 100000)"
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO products (name, price, description, image) VALUES (?, ?, ?, '')",
+            [(f"상품 {i}", 1000 + i, f"벤치마크용 상품 설명 {i}") for i in range(args.rows)]
+        )
+        conn.executemany(
+            "INSERT INTO orders (user_id, product_id, status) VALUES (?, ?, 'paid')",
+            [(uid, i % args.rows + 1) for i in range(args.rows)]
+        )
+        conn.executemany(
+            "INSERT INTO transactions (user_id, type, amount, description, status) VALUES (?, 'purchase', ?, '상품 구매', 'completed')",
+            [(uid, 1000 + i) for i in range(args.rows)]
+        )
+        conn.executemany(
+            "INSERT INTO recharge_requests (user_id, amount, status) VALUES (?, ?, 'pending')",
+            [(uid, 1000 + i) for i in range(args.rows)]
+        )
+        conn.commit()
+        conn.close()
+
+        user = application.test_client()
+        user.post("/login", data={"username": "bench", "password": "bench"})
+        admin = application.test_client()
+        admin.post("/login", data={"username": "admin", "password": "1234"})
+
+        routes = [
+            (user, "/"), (user, "/orders"), (user, "/transactions"),
+            (admin, "/admin/dashboard"), (admin, "/admin/recharge"),
+        ]
+        encodings = ["gzip"] + (["br"] if shop.brotli is not None else [])
+
+        print(f"compress (level={shop.COMPRESS_LEVEL}, rows={args.rows})")
+        print(f"  {'route':20s} {'raw':>9s} " + " ".join(f"{e:>9s} {e + ' ms':>8s}" for e in encodings))
+        for client, path in routes:
+            raw = client.get(path).get_data()
+            cols = []
+            for encoding in encodings:
+                resp = client.get(path, headers={"Accept-Encoding": encoding})
+                started = time.process_time()
+                for _ in range(args.reps):
+                    shop.compress_body(raw, encoding)
+                cpu_ms = (time.process_time() - started) / args.reps * 1000
+                cols.append(f"{len(resp.get_data()):9d} {cpu_ms:8.2f}")
+            print(f"  {path:20s} {len(raw):9d} " + " ".join(cols))
+
+
+# -----------------------------
+# 멀티 테넌트: 테넌트 수에 따른 메모리
+# -----------------------------
+def bench_tenants(args):
+    counts = [int(n) for n in args.counts.split(",")]
+    with tempfile.TemporaryDirectory() as tmp:
+        config = {
+            f"shop{i}.bench": {"name": f"상점 {i}", "db": os.path.join(tmp, f"shop{i}.db")}
+            for i in range(max(counts))
+        }
+        tenants_file = os.path.join(tmp, "tenants.json")
+        with open(tenants_file, "w", encoding="utf-8") as f:
+            json.dump(config, f)
+        os.environ["TENANTS_FILE"] = tenants_file
+        os.environ["TENANT_CACHE_SIZE"] = str(args.cache_size)
+        shop = load_shop(os.path.join(tmp, "default.db"))
+        client = shop.app.test_client()
+
+        # 테넌트마다 DB 생성 + 상품 채우기 (측정 전에)
+        for key in config:
+            with shop.use_tenant(shop.get_tenant(key)):
+                conn = shop.get_db()
+                conn.executemany(
+                    "INSERT INTO products (name, price, description, image) VALUES (?, ?, ?, '')",
+                    [(f"상품 {i}", 1000 + i, f"설명 {i}") for i in range(args.products)]
+                )
+                conn.commit()
+                conn.close()
+        shop._tenants.clear()
+
+        hosts = list(config)
+        client.get("/", base_url=f"http://{hosts[0]}")  # 템플릿 등 공용 초기화
+        shop._tenants.clear()
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+
+        print(f"tenants (products={args.products}, cache_size={args.cache_size})")
+        print(f"  {'tenants':>8s} {'cached':>7s} {'memory KB':>10s} {'KB/tenant':>10s}")
+        served = 0
+        for n in counts:
+            for host in hosts[served:n]:
+                client.get("/", base_url=f"http://{host}")
+            served = n
+            gc.collect()
+            used = tracemalloc.get_traced_memory()[0] - baseline
+            cached = len(shop._tenants)
+            print(f"  {n:8d} {cached:7d} {used / 1024:10.1f} {used / 1024 / max(cached, 1):10.1f}")
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DoveShop 벤치마크")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("startup", help="워커 부팅 시간 측정")
+    p.add_argument("--runs", type=int, default=10)
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser("stock", help="동시 결제 시 재고 초과 판매 여부 / 처리량")
+    p.add_argument("--stock", type=int, default=100)
+    p.add_argument("--workers", type=int, default=16)
+    p.add_argument("--attempts", type=int, default=300)
+    p.set_defaults(func=bench_stock)
+
+    p = sub.add_parser("compress", help="라우트별 응답 압축률 / CPU 비용")
+    p.add_argument("--rows", type=int, default=500)
+    p.add_argument("--reps", type=int, default=50)
+    p.set_defaults(func=bench_compress)
+
+    p = sub.add_parser("tenants", help="테넌트 수에 따른 프로세스 메모리")
+    p.add_argument("--counts", default="1,10,50,100")
+    p.add_argument("--products", type=int, default=50)
+    p.add_argument("--cache-size", type=int, default=32)
+    p.set_defaults(func=bench_tenants)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()